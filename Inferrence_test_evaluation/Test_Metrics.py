@@ -1,7 +1,8 @@
 import requests
 import time
 import json
-from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import aiohttp
 
 def test_various_inputs():
     """Test with various industry descriptions"""
@@ -44,26 +45,47 @@ def stress_test(duration=30, rps=10):
     """Run stress test for specified duration"""
     url = "http://127.0.0.1:8000/predict"
     payload = {"text": "Software development and cloud computing services"}
-    
+
     print(f"\n🔥 Stress Test: {duration}s at {rps} RPS")
-    
-    def worker():
+
+    async def run():
         requests_made = 0
-        start_time = time.time()
-        while time.time() - start_time < duration:
-            try:
-                requests.post(url, json=payload, timeout=5)
-                requests_made += 1
-                time.sleep(1.0 / rps)  # Maintain rate
-            except:
-                pass
+        interval = 1.0 / rps
+        # Bound in-flight requests so a slow server doesn't pile up tasks
+        sem = asyncio.Semaphore(rps)
+
+        async def send(session):
+            nonlocal requests_made
+            async with sem:
+                try:
+                    async with session.post(url, json=payload,
+                                            timeout=aiohttp.ClientTimeout(total=5)) as resp:
+                        await resp.read()
+                    requests_made += 1
+                except:
+                    pass
+
+        # One event loop drives all requests over kept-alive connections -
+        # no per-RPS OS thread and no per-request TCP setup
+        conn = aiohttp.TCPConnector(limit=0)
+        async with aiohttp.ClientSession(connector=conn) as session:
+            loop = asyncio.get_running_loop()
+            end_time = loop.time() + duration
+            next_send = loop.time()
+            tasks = []
+
+            while loop.time() < end_time:
+                tasks.append(asyncio.create_task(send(session)))
+                next_send += interval
+                delay = next_send - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            await asyncio.gather(*tasks)
+
         return requests_made
-    
-    # Start multiple workers
-    with ThreadPoolExecutor(max_workers=rps) as executor:
-        results = list(executor.map(lambda _: worker(), range(rps)))
-    
-    total_requests = sum(results)
+
+    total_requests = asyncio.run(run())
     actual_rps = total_requests / duration
     
     print(f"📈 Stress Test Results:")
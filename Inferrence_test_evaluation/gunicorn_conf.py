@@ -0,0 +1,88 @@
+"""gunicorn configuration that shares the model's arrays across workers.
+
+With --preload, forked workers start out sharing the parent's pages
+copy-on-write, but CPython refcount updates touch the pages holding the
+big coefficient arrays and gradually duplicate them in every worker.
+Publishing those arrays into multiprocessing.shared_memory keeps one
+physical copy no matter how many workers are running.
+
+Run with:  gunicorn -c gunicorn_conf.py wsgi:app
+"""
+
+import os
+
+import numpy as np
+from multiprocessing import shared_memory
+
+bind = "0.0.0.0:8000"
+workers = 4
+worker_class = "gthread"
+threads = 4
+preload_app = True
+
+# name -> (SharedMemory, shape, dtype); segments are owned by the master
+_SHARED = {}
+
+# SharedMemory handles opened by this worker. They must stay referenced
+# for the worker's lifetime: garbage-collecting a handle unmaps its
+# pages, leaving the model arrays pointing at freed memory (SIGSEGV on
+# the next prediction)
+_ATTACHED = []
+
+
+def _publish(name, arr):
+    arr = np.ascontiguousarray(arr)
+    # Suffix the segment with the master PID so two instances on one
+    # host never collide over a fixed name
+    seg_name = f"{name}_{os.getpid()}"
+    try:
+        shm = shared_memory.SharedMemory(create=True, size=arr.nbytes, name=seg_name)
+    except FileExistsError:
+        # A previous run with this PID died before on_exit could unlink
+        # its segments; reclaim the stale name instead of refusing to start
+        stale = shared_memory.SharedMemory(name=seg_name)
+        stale.close()
+        stale.unlink()
+        shm = shared_memory.SharedMemory(create=True, size=arr.nbytes, name=seg_name)
+    np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[:] = arr
+    _SHARED[name] = (shm, arr.shape, arr.dtype)
+
+
+def _attach(name):
+    master_shm, shape, dtype = _SHARED[name]
+    shm = shared_memory.SharedMemory(name=master_shm.name)
+    _ATTACHED.append(shm)
+    return np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def when_ready(server):
+    """Master hook: copy the classifier's big arrays into shared segments.
+
+    Only dense numpy attributes are shared; the vectorizer's vocabulary
+    is a Python dict and can't be mapped this way."""
+    from MetricsCollector_Flask_App import classifier
+
+    if classifier.model is not None and hasattr(classifier.model, 'coef_'):
+        _publish('clf_coef', classifier.model.coef_)
+        _publish('clf_intercept', classifier.model.intercept_)
+
+
+def post_fork(server, worker):
+    """Worker hook: re-point the model at the shared physical pages."""
+    from MetricsCollector_Flask_App import classifier
+
+    if 'clf_coef' in _SHARED:
+        classifier.model.coef_ = _attach('clf_coef')
+        classifier.model.intercept_ = _attach('clf_intercept')
+
+
+def worker_exit(server, worker):
+    """Worker hook: release this worker's mappings only at shutdown."""
+    for shm in _ATTACHED:
+        shm.close()
+
+
+def on_exit(server):
+    for shm, _, _ in _SHARED.values():
+        shm.close()
+        shm.unlink()
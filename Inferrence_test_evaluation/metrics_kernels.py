@@ -0,0 +1,69 @@
+"""Ahead-of-time compiled numeric kernels for the Flask app.
+
+Numba's JIT pays its compilation cost at the first call - a 1-10s stall
+that lands on whichever request a freshly forked worker serves first.
+Compiling these kernels ahead of time at deploy instead:
+
+    python metrics_kernels.py
+
+writes a native ``metrics_kernels_aot`` extension module next to this
+file. MetricsCollector_Flask_App imports it when present and falls back
+to its JIT/pure-Python helpers otherwise, so the build step is optional.
+
+numba.pycc was removed from numba 0.62 onwards, so the build step needs
+the pinned toolchain:
+
+    pip install 'numba<0.62'
+"""
+
+import numpy as np
+
+try:
+    from numba.pycc import CC
+except ImportError as exc:
+    raise ImportError(
+        "numba.pycc is needed to build these kernels but was removed in "
+        "numba 0.62; install the pinned toolchain: pip install 'numba<0.62'"
+    ) from exc
+
+cc = CC('metrics_kernels_aot')
+
+
+@cc.export('top3_f8', 'UniTuple(int64, 3)(f8[:])')
+@cc.export('top3_f4', 'UniTuple(int64, 3)(f4[:])')
+def top3(probabilities):
+    """One pass over the class probabilities keeping a sorted top-3."""
+    i0 = i1 = i2 = 0
+    p0 = p1 = p2 = -1.0
+    for i in range(probabilities.shape[0]):
+        p = probabilities[i]
+        if p > p0:
+            i2, p2 = i1, p1
+            i1, p1 = i0, p0
+            i0, p0 = i, p
+        elif p > p1:
+            i2, p2 = i1, p1
+            i1, p1 = i, p
+        elif p > p2:
+            i2, p2 = i, p
+    return i0, i1, i2
+
+
+@cc.export('percentiles', 'UniTuple(f8, 2)(f8[:])')
+def percentiles(latencies):
+    """Return (p95, p99) of a latency array via O(n) introselect.
+
+    Partitioning at the p99 rank leaves everything below it in the
+    prefix, so the p95 rank is found by partitioning just that prefix -
+    two linear passes, no full sort."""
+    n = latencies.shape[0]
+    k95 = int(0.95 * n)
+    k99 = int(0.99 * n)
+    part = np.partition(latencies, k99)
+    p99 = part[k99]
+    p95 = np.partition(part[:k99 + 1], k95)[k95]
+    return p95, p99
+
+
+if __name__ == '__main__':
+    cc.compile()
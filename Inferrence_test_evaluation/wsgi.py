@@ -0,0 +1,17 @@
+"""WSGI entry point for serving the classifier behind gunicorn.
+
+Flask's built-in server handles one request at a time; pre-forked
+workers lift that ceiling to N cores:
+
+    gunicorn --preload -w 4 -k gthread --threads 4 -b 0.0.0.0:8000 wsgi:app
+
+--preload loads the model and vectorizer once in the master before
+forking, so every worker shares that memory copy-on-write instead of
+re-loading the pickles.
+"""
+
+from MetricsCollector_Flask_App import app
+
+if __name__ == "__main__":
+    # Fallback for running directly without gunicorn
+    app.run(host='0.0.0.0', port=8000, debug=False)
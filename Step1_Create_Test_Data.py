@@ -22,12 +22,38 @@ Processing Steps:
 Dependencies:
 - pandas
 - scikit-learn
+- pyarrow (optional: multithreaded CSV parsing plus Parquet output)
 """
 
 # create_test_data.py
 import pandas as pd
+import numpy as np
 import os
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import StratifiedShuffleSplit
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pa_parquet
+except ImportError:  # pyarrow is optional; pandas CSV I/O still works
+    pa = None
+
+
+def _write_split(df, csv_path):
+    """
+    Save one data split as CSV, plus a Parquet copy when pyarrow is available.
+
+    pyarrow's CSV writer streams through a multithreaded C++ encoder instead
+    of pandas' single-threaded one, and the Parquet file alongside lets
+    downstream training stages load the split without re-parsing CSV.
+    """
+    if pa is None:
+        df.to_csv(csv_path, index=False)
+        return
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pa_csv.write_csv(table, csv_path)
+    pa_parquet.write_table(table, os.path.splitext(csv_path)[0] + ".parquet")
 
 
 def create_test_data():
@@ -49,9 +75,12 @@ def create_test_data():
     """
 
     try:
-        # Load balanced dataset
+        dataset_path = "balanced_dataset/balanced_dataset.csv"
+
+        # Pass 1: read the header only, so column detection costs nothing
+        # even when the file carries extra raw columns
         print("Loading balanced dataset...")
-        balanced_df = pd.read_csv("balanced_dataset/balanced_dataset.csv")
+        columns = pd.read_csv(dataset_path, nrows=0).columns
 
         # Auto-detect columns using common naming conventions
         label_candidates = ['label', 'category', 'class', 'target', 'industry', 'industry_name']
@@ -62,20 +91,20 @@ def create_test_data():
 
         # Detect label column
         for candidate in label_candidates:
-            if candidate in balanced_df.columns:
+            if candidate in columns:
                 label_col = candidate
                 break
 
         # Detect text column
         for candidate in text_candidates:
-            if candidate in balanced_df.columns:
+            if candidate in columns:
                 text_col = candidate
                 break
 
         # Validate column detection
         if not label_col or not text_col:
             print("Error: Could not auto-detect required columns")
-            print(f"Available columns: {balanced_df.columns.tolist()}")
+            print(f"Available columns: {columns.tolist()}")
             print(f"Label candidates tried: {label_candidates}")
             print(f"Text candidates tried: {text_candidates}")
             return False
@@ -83,38 +112,63 @@ def create_test_data():
         print(f"Using label column: {label_col}")
         print(f"Using text column: {text_col}")
 
-        # Split into train and test sets with stratification
+        # Pass 2: parse just the two columns the split needs. The label is
+        # loaded as a categorical (small integer codes plus a vocabulary),
+        # which shrinks memory and speeds up the stratification counts
+        if pa is not None:
+            # Multithreaded C++ CSV parser instead of pandas' Python-heavy one
+            table = pa_csv.read_csv(
+                dataset_path,
+                read_options=pa_csv.ReadOptions(use_threads=True),
+                # The full_summary cells contain embedded newlines; without
+                # this the chunked parser errors out on the real dataset
+                parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+                convert_options=pa_csv.ConvertOptions(
+                    include_columns=[label_col, text_col],
+                    column_types={label_col: pa.dictionary(pa.int32(), pa.string())}
+                )
+            )
+            balanced_df = table.to_pandas()
+        else:
+            balanced_df = pd.read_csv(
+                dataset_path,
+                usecols=[label_col, text_col],
+                dtype={label_col: 'category'}
+            )
+
+        # Split into train and test sets with stratification. The splitter
+        # returns integer index arrays instead of two new DataFrames, so
+        # peak memory stays at one copy of the dataset - each split is only
+        # materialized transiently while it is being written out
         print("Splitting data into train and test sets...")
-        train_df, test_df = train_test_split(
-            balanced_df,
-            test_size=0.2,
-            random_state=42,
-            stratify=balanced_df[label_col]
+        splitter = StratifiedShuffleSplit(n_splits=1, test_size=0.2, random_state=42)
+        train_idx, test_idx = next(
+            splitter.split(np.zeros(len(balanced_df)), balanced_df[label_col])
         )
 
-        # Create directories if they don't exist
+        # Create directory if it doesn't exist
         os.makedirs("train_test_data", exist_ok=True)
-        os.makedirs("balanced_dataset", exist_ok=True)
 
-        # Save train and test data
-        train_df.to_csv("train_test_data/train_data.csv", index=False)
-        test_df.to_csv("train_test_data/test_data.csv", index=False)
-        balanced_df.to_csv("balanced_dataset/balanced_dataset.csv", index=False)
+        # Save train and test data; the balanced dataset itself is already
+        # on disk unchanged, so there is nothing to write back
+        _write_split(balanced_df.iloc[train_idx], "train_test_data/train_data.csv")
+        _write_split(balanced_df.iloc[test_idx], "train_test_data/test_data.csv")
 
         # Print summary statistics
         print("\n=== Data Split Summary ===")
         print(f"Original data shape: {balanced_df.shape}")
-        print(f"Train data shape: {train_df.shape}")
-        print(f"Test data shape: {test_df.shape}")
+        print(f"Train data shape: ({len(train_idx)}, {balanced_df.shape[1]})")
+        print(f"Test data shape: ({len(test_idx)}, {balanced_df.shape[1]})")
         print(f"Train data saved to: train_test_data/train_data.csv")
         print(f"Test data saved to: train_test_data/test_data.csv")
 
         # Show class distribution
         if label_col:
+            labels = balanced_df[label_col]
             print(f"\nClass distribution in training set:")
-            print(train_df[label_col].value_counts())
+            print(labels.iloc[train_idx].value_counts())
             print(f"\nClass distribution in test set:")
-            print(test_df[label_col].value_counts())
+            print(labels.iloc[test_idx].value_counts())
 
         return True
 